@@ -1,150 +1,496 @@
 import polars as pl
 import pyodbc
 import os
-import math
+import io
 import sys
+import json
+import re
+from datetime import datetime, timezone
+import queue
+import threading
+import logging
+from logging.handlers import QueueHandler, QueueListener
 from dotenv import load_dotenv, find_dotenv
-from utils.funcs import blackswan_sql_conn
-import b2sdk.v2 as b2
+from utils.funcs import blackswan_sql_conn, blackswan_sql_uri, b2_s3_client
+import pyarrow as pa
+import pyarrow.parquet as pq
+from boto3.s3.transfer import TransferConfig
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # Load environment variables from .env file
 load_dotenv(find_dotenv())
 
-def saved_chunked_parquet_b2(df, bucket_name, prefix, target_size_gb=1):
+logger = logging.getLogger(__name__)
+
+# Split large chunks into 64 MiB parts uploaded 16 at a time
+UPLOAD_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=64 * 1024 * 1024,
+    multipart_chunksize=64 * 1024 * 1024,
+    max_concurrency=16,
+    use_threads=True
+)
+
+def read_sql_batches(database, sql_query, partition_on=None, batch_size=100_000):
+    """
+    Read a query from the Blackswan SQL Server as a stream of Polars DataFrames.
+    
+    With partition_on set, ConnectorX splits the query on that numeric column and fetches
+    the partitions in parallel over separate connections, straight into Arrow. The result
+    is materialized before it is sliced into batches, so this trades memory for fetch speed.
+    Without it, rows are fetched in batches through a single pyodbc cursor.
+    
+    Args:
+        database: Name of the database to connect to
+        sql_query: Query to run
+        partition_on: Optional numeric column to partition the query on
+        batch_size: Number of rows per yielded DataFrame
+    """
+    if partition_on:
+        df = pl.read_database_uri(
+            query=sql_query,
+            uri=blackswan_sql_uri(database),
+            engine="connectorx",
+            partition_on=partition_on,
+            partition_num=8
+        )
+        logger.info("Successfully read %d rows from database", df.height)
+        yield from df.iter_slices(n_rows=batch_size)
+    else:
+        with blackswan_sql_conn(database) as conn:
+            yield from pl.read_database(
+                query=sql_query,
+                connection=conn,
+                iter_batches=True,
+                batch_size=batch_size
+            )
+
+
+def _prefetch_batches(batches, depth=2):
+    """
+    Iterate over a stream of batches from a background thread, keeping up to depth batches ready.
+    
+    The parquet writer encodes and compresses a column at a time without parallelism of its
+    own, so this keeps the SQL fetch of the next batches running on another core meanwhile.
+    Errors raised while fetching are re-raised in the consuming thread. If the consumer stops
+    early (an upload failure, or the generator being closed), the fetch thread is signalled to
+    stop instead of blocking forever on a full queue.
+    """
+    ready = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+    
+    def put(item):
+        # Time out periodically so a stopped consumer can't leave this thread blocked
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def fetch():
+        try:
+            for batch in batches:
+                if not put(batch):
+                    return
+        except Exception as e:
+            put(e)
+        put(done)
+    
+    threading.Thread(target=fetch, daemon=True).start()
+    
+    try:
+        while (batch := ready.get()) is not done:
+            if isinstance(batch, Exception):
+                raise batch
+            yield batch
+    finally:
+        stop.set()
+        # Free any batches still held in the queue
+        while True:
+            try:
+                ready.get_nowait()
+            except queue.Empty:
+                break
+
+
+def safe_downcast_types(database, sql_query):
     """
-    Save a Polars DataFrame as chunked parquet files to Backblaze B2 using native B2 SDK.
+    Find Float64 and Int64 columns of a query that can be stored as Float32 and Int32 exactly.
+    
+    The check runs as one aggregate over the whole result set on the server, not on a sample
+    of it: an Int64 column qualifies only if every value fits in Int32, and a Float64 column
+    only if every value survives a round trip through REAL (Float32) unchanged, so no value
+    loses precision or overflows to inf. Rows written to the table after the check are not
+    covered: the strict cast raises for an integer that no longer fits, but a float that does
+    not round-trip would be rounded, so only use this on tables that are not being written to.
     
     Args:
-        df: Polars DataFrame to save
+        database: Name of the database to connect to
+        sql_query: Query whose result set will be uploaded
+    
+    Returns:
+        Dict of column name -> narrower Polars type, for saved_chunked_parquet_b2
+    """
+    def quote(name):
+        return "[" + name.replace("]", "]]") + "]"
+    
+    with blackswan_sql_conn(database) as conn:
+        schema = pl.read_database(
+            query=f"SELECT TOP 0 * FROM ({sql_query}) AS q",
+            connection=conn
+        ).schema
+        
+        checks = {}
+        for i, (name, dtype) in enumerate(schema.items()):
+            col = quote(name)
+            if dtype == pl.Float64:
+                # Count values that overflow REAL or change when rounded to it
+                checks[f"lossy_{i}"] = (
+                    f"SUM(CASE WHEN ABS({col}) > 3.4e38 THEN 1 "
+                    f"WHEN CAST(CAST({col} AS REAL) AS FLOAT) <> {col} THEN 1 ELSE 0 END)"
+                )
+            elif dtype == pl.Int64:
+                checks[f"min_{i}"] = f"MIN({col})"
+                checks[f"max_{i}"] = f"MAX({col})"
+        
+        if not checks:
+            return {}
+        
+        selects = ", ".join(f"{expr} AS {alias}" for alias, expr in checks.items())
+        stats = pl.read_database(
+            query=f"SELECT {selects} FROM ({sql_query}) AS q",
+            connection=conn
+        ).row(0, named=True)
+    
+    types = {}
+    for i, (name, dtype) in enumerate(schema.items()):
+        if dtype == pl.Float64 and not stats[f"lossy_{i}"]:
+            types[name] = pl.Float32
+        elif dtype == pl.Int64:
+            low, high = stats[f"min_{i}"], stats[f"max_{i}"]
+            # All-null columns have no range to check and are left as they are
+            if low is not None and low >= -2**31 and high < 2**31:
+                types[name] = pl.Int32
+    
+    logger.info("Columns that can be stored narrower without loss: %s", types)
+    return types
+
+
+def _write_row_group(writer, tables):
+    """
+    Write a list of Arrow tables to a ParquetWriter as a single row group.
+    """
+    table = pa.concat_tables(tables)
+    writer.write_table(table, row_group_size=table.num_rows)
+
+
+def _write_parquet_chunks(batches, target_size_bytes, row_group_bytes=64 * 1024 * 1024):
+    """
+    Write a stream of Polars DataFrames into in-memory parquet chunks of roughly target_size_bytes each.
+    
+    Batches are buffered until they add up to about row_group_bytes of in-memory data and
+    then appended to the open chunk as one row group with a pyarrow ParquetWriter, so only
+    one row group plus the encoded chunk is held in memory at a time. The default of 64 MiB
+    uncompressed gives row groups of around 20 MiB on disk, which suits the range GETs
+    DuckDB issues when scanning the chunks from B2. A new chunk is started before a batch
+    that would take the current one past the target size.
+    
+    The encoded size of buffered batches is estimated from the compression ratio seen in the
+    row groups written so far (a third until the first one is flushed), so a chunk can still
+    overshoot the target by the estimation error on its last row group.
+    
+    Yields:
+        (chunk_index, buffer, num_rows) for each completed chunk, with the buffer rewound
+    """
+    chunk_index = 0
+    writer = None
+    row_group_rows = None
+    
+    # Encoded and in-memory bytes of every row group flushed so far, for the compression ratio
+    encoded_total = 0
+    raw_total = 0
+    
+    def flush():
+        nonlocal encoded_total, raw_total
+        start = buffer.tell()
+        _write_row_group(writer, pending)
+        encoded_total += buffer.tell() - start
+        raw_total += pending_bytes
+    
+    for batch in batches:
+        table = batch.to_arrow()
+        batch_bytes = batch.estimated_size("b")
+        
+        # Convert the row group byte target into a row count from the first batch's row width
+        if row_group_rows is None:
+            bytes_per_row = max(1, batch_bytes // max(1, batch.height))
+            row_group_rows = max(1, row_group_bytes // bytes_per_row)
+        
+        # Roll over before a batch whose estimated encoded size would overflow the chunk
+        ratio = encoded_total / raw_total if raw_total else 0.35
+        if writer is not None and buffer.tell() + (pending_bytes + batch_bytes) * ratio > target_size_bytes:
+            if pending:
+                flush()
+            writer.close()
+            buffer.seek(0)
+            yield chunk_index, buffer, num_rows
+            chunk_index += 1
+            writer = None
+        
+        if writer is None:
+            logger.debug("Writing chunk %d to memory...", chunk_index + 1)
+            buffer = io.BytesIO()
+            # Min/max statistics let readers skip row groups that can't match a filter
+            writer = pq.ParquetWriter(
+                buffer,
+                table.schema,
+                compression="zstd",
+                compression_level=3,
+                write_statistics=True,
+                write_batch_size=65536
+            )
+            num_rows = 0
+            pending = []
+            pending_rows = 0
+            pending_bytes = 0
+        elif table.schema != writer.schema:
+            # Later batches may infer slightly different types; keep the file schema
+            table = table.cast(writer.schema)
+        
+        pending.append(table)
+        pending_rows += table.num_rows
+        pending_bytes += batch_bytes
+        num_rows += table.num_rows
+        
+        # Row groups are flushed on each write, so the buffer position is the chunk size so far
+        if pending_rows >= row_group_rows:
+            flush()
+            pending = []
+            pending_rows = 0
+            pending_bytes = 0
+    
+    if writer is not None:
+        if pending:
+            flush()
+        writer.close()
+        buffer.seek(0)
+        yield chunk_index, buffer, num_rows
+
+
+def _upload_one(s3, bucket_name, buffer, b2_key, i):
+    """
+    Upload a single in-memory chunk through the B2 S3-compatible endpoint.
+    
+    Chunks above the multipart threshold are split into parts that are uploaded concurrently.
+    
+    Returns:
+        True if the upload succeeded, False otherwise
+    """
+    logger.debug("Uploading chunk %d to %s/%s...", i + 1, bucket_name, b2_key)
+    
+    try:
+        s3.upload_fileobj(buffer, bucket_name, b2_key, Config=UPLOAD_TRANSFER_CONFIG)
+        logger.debug("Successfully uploaded chunk %d", i + 1)
+    except Exception as e:
+        logger.error("Error uploading chunk %d: %s", i + 1, e)
+        return False
+    finally:
+        # Release the chunk's memory as soon as it has been sent
+        buffer.close()
+    
+    return True
+
+
+def _delete_objects(s3, bucket_name, prefix, match=None):
+    """
+    Delete every object under prefix in the bucket, or only the keys for which match(key) is true.
+    """
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        keys = [obj['Key'] for obj in page.get('Contents', []) if match is None or match(obj['Key'])]
+        if keys:
+            s3.delete_objects(
+                Bucket=bucket_name,
+                Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+            )
+
+
+def _is_stale_chunk(key, prefix, run_prefix):
+    """
+    Whether key is a chunk this pipeline wrote under prefix that the current run replaces.
+    
+    That is anything in an earlier {prefix}/run_*/ folder, or a chunk_NNNN.parquet written
+    directly under prefix before runs had their own folder. Other files are left alone.
+    """
+    name = key[len(prefix) + 1:]
+    if key.startswith(f"{run_prefix}/"):
+        return False
+    return bool(re.fullmatch(r"run_[^/]+/.*", name) or re.fullmatch(r"chunk_\d+\.parquet", name))
+
+
+def saved_chunked_parquet_b2(batches, bucket_name, prefix, target_size_gb=1, downcast_types=None):
+    """
+    Save a stream of Polars DataFrames as chunked parquet files to Backblaze B2.
+    
+    Chunks are written under a run-specific prefix, {prefix}/run_<UTC timestamp>/. Only once
+    every chunk is uploaded is {prefix}/metadata.json updated to point at the new run and
+    earlier runs deleted; a failed run removes its own chunks instead, and a run that wrote
+    no chunks leaves the previous one in place.
+    
+    Args:
+        batches: Iterable of Polars DataFrames, e.g. from pl.read_database(..., iter_batches=True)
         bucket_name: Name of the B2 bucket
         prefix: Path prefix within the bucket
         target_size_gb: Target size of each chunk in GB
+        downcast_types: Optional dict of column name -> narrower Polars type to store the column
+            as, from safe_downcast_types; downcast columns are listed in metadata.json
     """
     # Get B2 credentials from environment
     key_id = os.getenv("B2_KEY_ID")
     app_key = os.getenv("B2_APP_KEY")
     
     if not all([key_id, app_key, bucket_name]):
-        print("Error: Missing B2 credentials or bucket name.")
+        logger.error("Missing B2 credentials or bucket name.")
         return
 
-    # Create temp directory
-    temp_dir = "/tmp/chunked_data"
-    os.makedirs(temp_dir, exist_ok=True)
-    
     try:
-        # Initialize B2 API
-        print("Initializing B2 API...")
-        info = b2.InMemoryAccountInfo()
-        b2_api = b2.B2Api(info)
-        
-        # Authorize account
-        print("Authorizing with B2...")
-        b2_api.authorize_account("production", key_id, app_key)
-        
-        # Get the bucket
-        print(f"Getting bucket: {bucket_name}")
-        bucket = b2_api.get_bucket_by_name(bucket_name)
-        
-        # Estimate row size and calculate chunk size
-        # First, sample a small portion of the DataFrame to estimate size
-        sample_size = min(10000, df.height)
-        sample_df = df.slice(0, sample_size)
-        
-        # Write sample to disk to check size
-        sample_path = f"{temp_dir}/sample.parquet"
-        sample_df.write_parquet(sample_path, compression="snappy")
-        
-        # Get sample file size in bytes
-        sample_file_size = os.path.getsize(sample_path)
-        
-        # Calculate estimated size per row
-        bytes_per_row = sample_file_size / sample_size
-        
-        # Calculate target size in bytes (with 10% margin to be safe)
-        target_size_bytes = target_size_gb * 1024 * 1024 * 1024 * 0.9
-        
-        # Calculate rows per chunk
-        rows_per_chunk = int(target_size_bytes / bytes_per_row)
-        
-        # Calculate number of chunks
-        total_rows = df.height
-        num_chunks = math.ceil(total_rows / rows_per_chunk)
-        
-        print(f"Splitting DataFrame with {total_rows} rows into {num_chunks} chunks of ~{rows_per_chunk} rows each")
-        
-        # Create and upload chunks
-        for i in range(num_chunks):
-            start_idx = i * rows_per_chunk
-            end_idx = min((i + 1) * rows_per_chunk, total_rows)
-            
-            # Using Polars slice method
-            chunk_df = df.slice(start_idx, end_idx - start_idx)
-            chunk_path = f"{temp_dir}/chunk_{i:04d}.parquet"
-            
-            # Write chunk to local file
-            print(f"Writing chunk {i+1}/{num_chunks} to local file...")
-            chunk_df.write_parquet(chunk_path, compression="snappy")
-            
-            # Get file size before upload
-            chunk_size_mb = os.path.getsize(chunk_path) / (1024 * 1024)
-            print(f"Chunk {i+1}/{num_chunks} size: {chunk_size_mb:.2f} MB")
-            
-            # Upload file to B2
-            b2_key = f"{prefix}/chunk_{i:04d}.parquet"
-            print(f"Uploading chunk {i+1}/{num_chunks} to {bucket_name}/{b2_key}...")
-            
-            try:
-                with open(chunk_path, 'rb') as file:
-                    # Upload file data to B2
-                    file_info = {}  # Optional metadata
-                    bucket.upload_local_file(
-                        local_file=chunk_path,
-                        file_name=b2_key,
-                        file_infos=file_info
-                    )
-                print(f"Successfully uploaded chunk {i+1}/{num_chunks}")
-            except Exception as e:
-                print(f"Error uploading chunk {i+1}/{num_chunks}: {str(e)}")
-                print("Continuing with next chunk...")
-                continue
-            
-            # Clean up local file to save space
-            os.remove(chunk_path)
+        # S3-compatible client for all uploads to the B2 bucket
+        logger.info("Connecting to B2 S3 endpoint...")
+        s3 = b2_s3_client()
+        
+        # Calculate target size in bytes; chunks can overshoot it slightly, see _write_parquet_chunks
+        target_size_bytes = target_size_gb * 1024 * 1024 * 1024
+        
+        logger.info("Streaming data into chunks of ~%s GB", target_size_gb)
+        
+        # Narrow numeric columns before encoding to halve their size on disk and on the wire
+        downcast_types = downcast_types or {}
+        if downcast_types:
+            batches = (batch.cast(downcast_types, strict=True) for batch in batches)
+        
+        # Each run writes its chunks under its own prefix and metadata.json points readers at the
+        # last complete run, so a failed or shorter run never mixes its chunks with an earlier one
+        run_prefix = f"{prefix}/run_{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}"
+        
+        # Write chunks and upload completed ones in the background while the next is written
+        max_workers = 4
+        chunk_rows = []
+        uploads = []
+        prefetched = _prefetch_batches(batches)
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                pending = set()
+                for i, buffer, num_rows in _write_parquet_chunks(prefetched, target_size_bytes):
+                    chunk_rows.append(num_rows)
+                    
+                    chunk_size_mb = buffer.getbuffer().nbytes / (1024 * 1024)
+                    logger.debug("Chunk %d size: %.2f MB (%d rows)", i + 1, chunk_size_mb, num_rows)
+                    
+                    # Bound the number of encoded chunks held in memory while waiting to upload
+                    if len(pending) >= max_workers:
+                        wait(pending, return_when=FIRST_COMPLETED)
+                    done = {future for future in pending if future.done()}
+                    pending -= done
+                    
+                    # One failed chunk dooms the run, so stop reading and encoding the rest of the table
+                    if not all(future.result() for future in done):
+                        raise RuntimeError("A chunk failed to upload; stopping the run")
+                    
+                    b2_key = f"{run_prefix}/chunk_{i:04d}.parquet"
+                    future = executor.submit(_upload_one, s3, bucket_name, buffer, b2_key, i)
+                    uploads.append((i, future))
+                    pending.add(future)
+                
+                # Wait for the remaining uploads to finish
+                wait(pending)
+        except Exception:
+            # Don't leave a partial run behind; readers still see the previous complete one
+            _delete_objects(s3, bucket_name, f"{run_prefix}/")
+            raise
+        finally:
+            # Stops the fetch thread if the loop exited early
+            prefetched.close()
+        
+        # An empty result set writes no chunks; keep the previous run rather than replace it
+        if not chunk_rows:
+            logger.warning("Query returned no rows; metadata.json and earlier runs left unchanged")
+            return
         
-        # Clean up sample file
-        os.remove(sample_path)
+        # Metadata describes a complete upload, so don't publish it if any chunk is missing
+        failed = [i + 1 for i, future in uploads if not future.result()]
+        if failed:
+            logger.error(
+                "%d of %d chunks failed to upload (chunks %s); metadata.json not written",
+                len(failed), len(uploads), failed
+            )
+            _delete_objects(s3, bucket_name, f"{run_prefix}/")
+            return
         
         # Create and upload metadata file with information about the chunks
         metadata = {
-            "num_chunks": num_chunks,
-            "total_rows": total_rows,
-            "rows_per_chunk": rows_per_chunk,
-            "compression": "snappy",
-            "format_version": "1.0"
+            "num_chunks": len(chunk_rows),
+            "total_rows": sum(chunk_rows),
+            "chunk_rows": chunk_rows,
+            "run_prefix": run_prefix,
+            "compression": "zstd",
+            "downcast_columns": {name: str(dtype) for name, dtype in downcast_types.items()},
+            "format_version": "2.1"
         }
         
-        import json
-        metadata_path = f"{temp_dir}/metadata.json"
-        with open(metadata_path, 'w') as f:
-            json.dump(metadata, f)
-        
         try:
-            print(f"Uploading metadata to {bucket_name}/{prefix}/metadata.json...")
-            bucket.upload_local_file(
-                local_file=metadata_path,
-                file_name=f"{prefix}/metadata.json"
+            logger.info("Uploading metadata to %s/%s/metadata.json...", bucket_name, prefix)
+            s3.put_object(
+                Bucket=bucket_name,
+                Key=f"{prefix}/metadata.json",
+                Body=json.dumps(metadata).encode(),
+                ContentType="application/json"
             )
-            print("Successfully uploaded metadata")
+            logger.info("Successfully uploaded metadata")
         except Exception as e:
-            print(f"Error uploading metadata: {str(e)}")
+            logger.error("Error uploading metadata: %s", e)
+            _delete_objects(s3, bucket_name, f"{run_prefix}/")
+            return
         
-        os.remove(metadata_path)
+        # Remove earlier runs (and chunks from before runs had their own prefix) now that
+        # metadata.json points at this one; other files under prefix are not touched
+        _delete_objects(
+            s3, bucket_name, f"{prefix}/",
+            match=lambda key: _is_stale_chunk(key, prefix, run_prefix)
+        )
         
-        print("Chunking and upload process complete")
+        logger.info("Chunking and upload process complete: %d chunks, %d rows", len(chunk_rows), sum(chunk_rows))
         
     except Exception as e:
-        print(f"Error in chunking process: {str(e)}")
+        logger.error("Error in chunking process: %s", e)
+
+
+def _configure_logging(level=logging.INFO):
+    """
+    Send log records through a queue so upload threads never block on writing to stdout.
+    
+    Per-chunk progress is logged at DEBUG; pass level=logging.DEBUG to see it. Calling this
+    again, e.g. from a notebook, replaces the earlier handler; stop the earlier listener first.
+    
+    Returns:
+        The started QueueListener, to be stopped once the run is finished
+    """
+    log_queue = queue.Queue()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    
+    # Attach to this module's logger only, so library output is left to the root logger's
+    # configuration, and replace the handler from any earlier call rather than adding a second
+    for old_handler in [h for h in logger.handlers if isinstance(h, QueueHandler)]:
+        logger.removeHandler(old_handler)
+    logger.addHandler(QueueHandler(log_queue))
+    logger.propagate = False
+    logger.setLevel(level)
+    
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    return listener
 
 
 # Main script execution
@@ -161,24 +507,35 @@ if __name__ == "__main__":
         print("WARNING: B2_BUCKET_NAME not set in environment variables.")
         bucket_name = input("Please enter the B2 bucket name: ")
     
+    log_listener = _configure_logging()
+    
     try:
-        with blackswan_sql_conn("crc_bloomberg_data") as conn:
-            # Define the SQL query to fetch data
-            sql_query = """
-            SELECT * FROM RD_Equities_Hist
-            """
-            
-            print("Reading data from SQL database...")
-            df = pl.read_database(query=sql_query, connection=conn)
-            print(f"Successfully read {df.height} rows from database")
-            
-            # Run the upload function
-            saved_chunked_parquet_b2(
-                df,
-                bucket_name=bucket_name,
-                prefix="data/chunked",
-                target_size_gb=1
-            )
-            
+        # Define the SQL query to fetch data
+        sql_query = """
+        SELECT * FROM RD_Equities_Hist
+        """
+        
+        # Optional numeric column to split the query on for a parallel ConnectorX fetch
+        partition_on = os.getenv("SQL_PARTITION_COLUMN")
+        
+        # Stream the result set in batches instead of materializing the whole table
+        logger.info("Reading data from SQL database...")
+        batches = read_sql_batches("crc_bloomberg_data", sql_query, partition_on=partition_on)
+        
+        # Store numeric columns narrower only where every value in the table fits exactly
+        downcast_types = safe_downcast_types("crc_bloomberg_data", sql_query)
+        
+        # Run the upload function
+        saved_chunked_parquet_b2(
+            batches,
+            bucket_name=bucket_name,
+            prefix="data/chunked",
+            target_size_gb=1,
+            downcast_types=downcast_types
+        )
+        
     except Exception as e:
-        print(f"Error during SQL connection or data processing: {str(e)}")
\ No newline at end of file
+        logger.error("Error during SQL connection or data processing: %s", e)
+    
+    finally:
+        log_listener.stop()
\ No newline at end of file
@@ -2,11 +2,9 @@ import polars as pl
 import pyodbc
 import os
 from dotenv import load_dotenv, find_dotenv
-from utils.funcs import blackswan_sql_conn
+from utils.funcs import blackswan_sql_conn, b2_s3_client
 import pyarrow as pa
 import pyarrow.parquet as pq
-import boto3
-from botocore.client import Config
 import math
 
 # Load environment variables from .env file
@@ -17,21 +15,18 @@ print(os.getenv("B2_KEY_ID"))
 print(os.getenv("B2_APP_KEY"))
 print(os.getenv("B2_S3_BUCKET_NAME"))
 
-def test_s3_connection(s3_resource, bucket_name):
+def test_s3_connection(s3_client, bucket_name):
     """Test the S3 connection by listing buckets"""
     try:
         print("Testing S3 connection...")
         # List buckets to test connection
-        for bucket in s3_resource.buckets.all():
-            print(f"Found bucket: {bucket.name}")
+        for bucket in s3_client.list_buckets()["Buckets"]:
+            print(f"Found bucket: {bucket['Name']}")
         
-        # Try to access the specific bucket
-        bucket = s3_resource.Bucket(bucket_name)
-        
-        # List a few objects to ensure access (limit to 5 for brevity)
+        # List a few objects in the specific bucket to ensure access (limit to 5 for brevity)
         count = 0
-        for obj in bucket.objects.limit(5):
-            print(f"Found object: {obj.key}")
+        for obj in s3_client.list_objects_v2(Bucket=bucket_name, MaxKeys=5).get("Contents", []):
+            print(f"Found object: {obj['Key']}")
             count += 1
         
         if count == 0:
@@ -45,13 +40,7 @@ def test_s3_connection(s3_resource, bucket_name):
     
 # Configure the B2 connection
 
-s3 = boto3.resource(
-    's3',
-    endpoint_url=os.getenv("B2_S3_ENDPOINT_URL"),
-    aws_access_key_id=os.getenv("B2_KEY_ID"),
-    aws_secret_access_key=os.getenv("B2_APP_KEY"),
-    config=Config(signature_version='s3v4')
-)
+s3 = b2_s3_client()
 
 bucket_name = os.getenv("B2_S3_BUCKET_NAME")
 # Test the connection
@@ -1,21 +1,19 @@
 import os
+import json
 import duckdb
-import b2sdk.v2 as b2
 from dotenv import load_dotenv, find_dotenv
+from utils.funcs import b2_s3_client
 
-def create_duckdb_with_b2_data(bucket_name, prefix, db_path="b2_data.duckdb", table_name="b2_data"):
+def configure_b2_httpfs(conn):
     """
-    Create a DuckDB database that directly queries data from a B2 bucket.
+    Load httpfs on a DuckDB connection and point its S3 settings at the B2 bucket endpoint.
+    
+    Views created by create_duckdb_with_b2_data read straight from B2, so any new connection
+    to the database file needs this before querying them.
     
     Args:
-        bucket_name: Name of the B2 bucket
-        prefix: Path prefix in bucket where data is stored
-        db_path: Path to save the DuckDB database
-        table_name: Name of the table to create
+        conn: DuckDB connection to configure
     """
-    # Load environment variables
-    load_dotenv(find_dotenv())
-    
     # Get B2 credentials
     key_id = os.getenv("B2_KEY_ID")
     app_key = os.getenv("B2_APP_KEY")
@@ -25,32 +23,6 @@ def create_duckdb_with_b2_data(bucket_name, prefix, db_path="b2_data.duckdb", ta
     if endpoint.startswith("https://"):
         endpoint = endpoint[8:]
     
-    if not all([key_id, app_key, bucket_name]):
-        raise ValueError("Missing B2 credentials or bucket name")
-    
-    # Connect to B2 to list files
-    print("Connecting to B2...")
-    info = b2.InMemoryAccountInfo()
-    b2_api = b2.B2Api(info)
-    b2_api.authorize_account("production", key_id, app_key)
-    bucket = b2_api.get_bucket_by_name(bucket_name)
-    
-    # List parquet files
-    print(f"Listing files in {bucket_name}/{prefix}...")
-    parquet_files = []
-    for file_info, _ in bucket.ls(folder_to_list=prefix):
-        if file_info.file_name.endswith('.parquet'):
-            parquet_files.append(file_info.file_name)
-    
-    print(f"Found {len(parquet_files)} parquet files")
-    
-    # Create S3 URLs for the parquet files
-    s3_urls = [f"s3://{bucket_name}/{file_name}" for file_name in parquet_files]
-    
-    # Initialize DuckDB and load httpfs extension
-    print(f"Creating DuckDB database: {db_path}")
-    conn = duckdb.connect(database=db_path)
-    
     # Install and load httpfs extension
     print("Setting up httpfs extension...")
     conn.execute("INSTALL httpfs;")
@@ -64,25 +36,69 @@ def create_duckdb_with_b2_data(bucket_name, prefix, db_path="b2_data.duckdb", ta
     conn.execute(f"SET s3_endpoint='{endpoint}';")
     conn.execute(f"SET s3_url_style='path';")
     
-    # Additional settings to improve reliability
-    conn.execute("SET enable_http_metadata_cache=false;")
-    conn.execute("SET enable_object_cache=false;")
+    # Cache file and parquet metadata so repeated queries don't re-fetch the footers
+    conn.execute("SET enable_http_metadata_cache=true;")
+    conn.execute("SET enable_object_cache=true;")
+    
+    # Reuse connections across row group requests and fetch row groups in parallel
+    conn.execute("SET http_keep_alive=true;")
+    conn.execute("SET threads=16;")
+    conn.execute("SET memory_limit='8GB';")
     conn.execute("SET http_timeout=30000;")  # 30 seconds timeout
+
+def create_duckdb_with_b2_data(bucket_name, prefix, db_path="b2_data.duckdb", table_name="b2_data"):
+    """
+    Create a DuckDB database that directly queries data from a B2 bucket.
+    
+    The data is exposed as a view over the parquet files rather than copied into a table,
+    so DuckDB can push column projections and filters down into the parquet reader. The
+    view reads from B2 on every query, so the connection needs the same S3 settings. It is
+    pinned to the upload run named in metadata.json, so recreate it after a new upload.
+    
+    Args:
+        bucket_name: Name of the B2 bucket
+        prefix: Path prefix in bucket where data is stored
+        db_path: Path to save the DuckDB database
+        table_name: Name of the view to create
+    """
+    # Load environment variables
+    load_dotenv(find_dotenv())
+    
+    # Get B2 credentials
+    key_id = os.getenv("B2_KEY_ID")
+    app_key = os.getenv("B2_APP_KEY")
+    
+    if not all([key_id, app_key, bucket_name]):
+        raise ValueError("Missing B2 credentials or bucket name")
+    
+    # metadata.json points at the last complete upload run; only that run's chunks are read
+    print(f"Reading {bucket_name}/{prefix}/metadata.json...")
+    s3 = b2_s3_client()
+    metadata = json.loads(s3.get_object(Bucket=bucket_name, Key=f"{prefix}/metadata.json")["Body"].read())
+    
+    # Let DuckDB expand the chunk glob itself with a single listing of the run prefix
+    s3_glob = f"s3://{bucket_name}/{metadata['run_prefix']}/chunk_*.parquet"
+    
+    # Initialize DuckDB and load httpfs extension
+    print(f"Creating DuckDB database: {db_path}")
+    conn = duckdb.connect(database=db_path)
+    
+    # Read the parquet files straight from B2 through httpfs
+    configure_b2_httpfs(conn)
     
-    # Create table from direct S3 URLs
-    urls_str = ", ".join([f"'{url}'" for url in s3_urls])
-    create_table_sql = f"""
-    CREATE TABLE {table_name} AS 
-    SELECT * FROM parquet_scan([{urls_str}]);
+    # Create view over the S3 glob
+    create_view_sql = f"""
+    CREATE OR REPLACE VIEW {table_name} AS 
+    SELECT * FROM parquet_scan('{s3_glob}', hive_partitioning=false, union_by_name=false);
     """
     
-    print(f"Creating table '{table_name}' by directly querying {len(s3_urls)} files...")
+    print(f"Creating view '{table_name}' over {s3_glob}...")
     try:
-        conn.execute(create_table_sql)
+        conn.execute(create_view_sql)
         row_count = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
-        print(f"Successfully created table '{table_name}' with {row_count} rows")
+        print(f"Successfully created view '{table_name}' with {row_count} rows")
     except Exception as e:
-        print(f"Error creating table directly: {str(e)}")
+        print(f"Error creating view directly: {str(e)}")
         print("DuckDB may not be able to directly access the B2 bucket via S3. Consider using the download approach instead.")
     
     # Close the connection
@@ -97,4 +113,4 @@ if __name__ == "__main__":
     db_path = "b2_data.duckdb"
     
     db_file = create_duckdb_with_b2_data(bucket_name, prefix, db_path)
-    print(f"\nYou can now use the database with: duckdb.connect('{db_file}')")
\ No newline at end of file
+    print(f"\nYou can now use the database with: duckdb.connect('{db_file}') followed by configure_b2_httpfs(conn)")
\ No newline at end of file
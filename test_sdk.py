@@ -1,6 +1,6 @@
 import os
 from dotenv import load_dotenv, find_dotenv
-from b2sdk.v2 import *
+from utils.funcs import b2_s3_client
 
 # Load environment variables
 load_dotenv(find_dotenv())
@@ -16,41 +16,34 @@ print(f"Bucket Name: {bucket_name}")
 
 
 try:
-    print("\nInitializing B2 API...")
-    # Create the B2 info object
-    info = InMemoryAccountInfo()
-    
-    # Create the B2 API client
-    b2_api = B2Api(info)
-    
-    # Authorize account
-    print("Authorizing with B2...")
-    b2_api.authorize_account("production", key_id, app_key)
-    
-    print("\nConnection established successfully!")
+    print("\nInitializing B2 S3 client...")
+    # Create the S3-compatible client for the B2 endpoint
+    s3 = b2_s3_client()
     
     # List buckets
     print("Listing buckets...")
-    for bucket in b2_api.list_buckets():
-        print(f"Found bucket: {bucket.name} (ID: {bucket.id_})")
+    for bucket in s3.list_buckets()["Buckets"]:
+        print(f"Found bucket: {bucket['Name']}")
+    
+    print("\nConnection established successfully!")
     
     # Try to access the specific bucket
     if bucket_name:
         print(f"\nTrying to access specific bucket: {bucket_name}")
-        bucket = b2_api.get_bucket_by_name(bucket_name)
-        print(f"Successfully accessed bucket: {bucket.name}")
+        s3.head_bucket(Bucket=bucket_name)
+        print(f"Successfully accessed bucket: {bucket_name}")
         
         # List files
         print("\nListing files (up to 10)...")
         file_count = 0
-        for file_version, _ in bucket.ls(limit=10):
-            print(f"Found file: {file_version.file_name}")
+        for obj in s3.list_objects_v2(Bucket=bucket_name, MaxKeys=10).get("Contents", []):
+            print(f"Found file: {obj['Key']}")
             file_count += 1
         
         if file_count == 0:
             print("No files found in this bucket")
     
-    print("\nNative B2 API test SUCCESSFUL")
+    print("\nB2 S3 API test SUCCESSFUL")
     
 except Exception as e:
-    print(f"\nNative B2 API test FAILED: {str(e)}")
\ No newline at end of file
+    print(f"\nB2 S3 API test FAILED: {str(e)}")
\ No newline at end of file
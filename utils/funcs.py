@@ -1,10 +1,73 @@
 import os 
+import atexit
+import functools
 import pyodbc
+import boto3
+from botocore.client import Config
+from urllib.parse import quote_plus
 
-def blackswan_sql_conn(database):
-    database = database
+# Open Blackswan connections by database, kept for the life of the process
+_blackswan_conns = {}
+
+def _blackswan_credentials():
     server = os.getenv("BLACKSWAN_DB_HOST")
     user = os.getenv("BLACKSWAN_DB_USER")
     password = os.getenv("BLACKSWAN_DB_PW")
 
-    return pyodbc.connect('DRIVER={ODBC Driver 18 for SQL Server};SERVER='+server+';DATABASE='+database+';UID='+user+';PWD='+ password)
+    if not all([server, user, password]):
+        raise ValueError("Missing BLACKSWAN_DB_HOST, BLACKSWAN_DB_USER or BLACKSWAN_DB_PW")
+
+    return server, user, password
+
+def _blackswan_conn_str(database):
+    server, user, password = _blackswan_credentials()
+
+    return f"DRIVER={{ODBC Driver 18 for SQL Server}};SERVER={server};DATABASE={database};UID={user};PWD={password}"
+
+def blackswan_sql_conn(database):
+    # Reuse the open connection for this database instead of paying for a new login.
+    # Using it as a context manager only commits; it stays open until process exit.
+    conn = _blackswan_conns.get(database)
+    if conn is None or conn.closed:
+        conn = pyodbc.connect(_blackswan_conn_str(database))
+        _blackswan_conns[database] = conn
+
+    return conn
+
+@atexit.register
+def _close_blackswan_conns():
+    for conn in _blackswan_conns.values():
+        if not conn.closed:
+            conn.close()
+
+def blackswan_sql_uri(database):
+    server, user, password = _blackswan_credentials()
+    user = quote_plus(user)
+    password = quote_plus(password)
+
+    # ODBC Driver 18 encrypts by default, so ask ConnectorX to do the same
+    return f"mssql://{user}:{password}@{server}/{database}?encrypt=true"
+
+@functools.lru_cache(maxsize=1)
+def b2_s3_client():
+    # One client per process: boto3 clients are thread-safe, so the upload threads and every
+    # caller share its connection pool, which is sized for the concurrent multipart uploads
+    endpoint_url = os.getenv("B2_S3_ENDPOINT_URL")
+    key_id = os.getenv("B2_KEY_ID")
+    app_key = os.getenv("B2_APP_KEY")
+
+    # Raise rather than cache a client built before the .env file was loaded
+    if not all([endpoint_url, key_id, app_key]):
+        raise ValueError("Missing B2_S3_ENDPOINT_URL, B2_KEY_ID or B2_APP_KEY")
+
+    return boto3.client(
+        's3',
+        endpoint_url=endpoint_url,
+        aws_access_key_id=key_id,
+        aws_secret_access_key=app_key,
+        config=Config(
+            signature_version='s3v4',
+            max_pool_connections=64,
+            retries={'max_attempts': 5, 'mode': 'adaptive'}
+        )
+    )